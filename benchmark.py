@@ -0,0 +1,133 @@
+"""Compare Sudachi dictionary sizes on a corpus.
+
+The corpus has one sentence per line. Lines may mark the expected
+segmentation by separating units with spaces; those are scored against the
+post_parse segmentation. Each dictionary is measured in a fresh process so
+that load time and RSS are not skewed by the others.
+
+    python benchmark.py corpus.txt [--dicts small core full]
+"""
+
+import argparse
+import importlib.util
+import json
+import subprocess
+import sys
+import time
+from typing import Dict, List, Set, Tuple
+
+
+def boundaries(units: List[str]) -> Set[int]:
+    result = set()
+    i = 0
+    for unit in units:
+        i += len(unit)
+        result.add(i)
+    return result
+
+
+def read_corpus(path: str) -> List[Tuple[str, List[str]]]:
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            units = line.split()
+            if units:
+                corpus.append(("".join(units), units if len(units) > 1 else []))
+    return corpus
+
+
+def measure(sudachi_dict: str, corpus_path: str) -> Dict[str, float]:
+    import ja_helper
+
+    corpus = read_corpus(corpus_path)
+
+    # Load the Sudachi dictionary on its own, before Jamdict, MeCab and the
+    # translator, so the numbers are its cost alone
+    rss_before = ja_helper.current_rss_kb()
+    start = time.monotonic()
+    sudachi_tokenizer = ja_helper.sudachi_dictionary(sudachi_dict).create()
+    load_seconds = time.monotonic() - start
+    rss_after = ja_helper.current_rss_kb()
+    load_rss_kb = rss_after - rss_before if rss_before and rss_after else 0
+
+    # Then reuse that tokenizer rather than loading the dictionary again
+    ja_helper.configure_resource_pool(1, sudachi_dict=sudachi_dict)
+    ja_helper.resource_pool.add(
+        ja_helper.create_resources(sudachi_dict, sudachi_tokenizer)
+    )
+    with ja_helper.held_resources():
+        true_positives = predicted = expected = 0
+        found = looked_up = 0
+        start = time.monotonic()
+        for text, gold in corpus:
+            morphs = ja_helper.post_parse(ja_helper.parse(text))
+
+            if gold:
+                predicted_bounds = boundaries([m.surface() for m in morphs])
+                gold_bounds = boundaries(gold)
+                true_positives += len(predicted_bounds & gold_bounds)
+                predicted += len(predicted_bounds)
+                expected += len(gold_bounds)
+
+            for m in morphs:
+                if m.display_part_of_speech() in ja_helper.SKIPPED_POS:
+                    continue
+                looked_up += 1
+                found += bool(ja_helper.search_morpheme(m, match_reading=False))
+
+        parse_seconds = time.monotonic() - start
+
+    precision = true_positives / predicted if predicted else 0.0
+    recall = true_positives / expected if expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "load_seconds": load_seconds,
+        "load_rss_mb": load_rss_kb / 1024,
+        "peak_rss_mb": ja_helper.peak_rss_kb() / 1024,
+        "sentences_per_second": len(corpus) / parse_seconds if parse_seconds else 0.0,
+        "segmentation_f1": f1,
+        "lookup_coverage": found / looked_up if looked_up else 0.0,
+    }
+
+
+def installed_dicts() -> List[str]:
+    from ja_helper import SUDACHI_DICTS
+
+    return [d for d in SUDACHI_DICTS if importlib.util.find_spec(f"sudachidict_{d}")]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus")
+    parser.add_argument("--dicts", nargs="+", default=installed_dicts())
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.corpus)))
+        return
+
+    columns = [
+        "load_seconds",
+        "load_rss_mb",
+        "peak_rss_mb",
+        "sentences_per_second",
+        "segmentation_f1",
+        "lookup_coverage",
+    ]
+    print("dict\t" + "\t".join(columns))
+    for name in args.dicts:
+        proc = subprocess.run(
+            [sys.executable, __file__, args.corpus, "--child", name],
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        if proc.returncode:
+            print(f"{name}\tfailed")
+            continue
+        result = json.loads(proc.stdout.splitlines()[-1])
+        print(name + "\t" + "\t".join(f"{result[c]:.3f}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
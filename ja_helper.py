@@ -1,11 +1,37 @@
+import os
 import sys
+import html
+import time
+import json
+import argparse
+import importlib
+import tempfile
 import googletrans
+import httpx
 import re
 import jaconv
 import romkan
 import functools
-
-from typing import Collection, Dict, List, Optional, Tuple, TypeVar, Union
+import contextlib
+import queue
+import threading
+import collections
+import multiprocessing
+import sqlite3
+import traceback
+from pathlib import Path
+
+from typing import (
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 from sudachipy import dictionary, morpheme
 from sudachipy.morpheme import Morpheme
 import sudachipy.tokenizer as tokenizer
@@ -14,6 +40,7 @@ from dataclasses import dataclass
 from jamdict import Jamdict, jmdict
 from japaneseverbconjugator.src.constants.EnumeratedTypes import VerbClass
 import jconj.conj as jconj
+import sudachipy
 
 SudachiPos = Tuple[str, str, str, str, str, str]
 K = TypeVar("K")
@@ -23,10 +50,35 @@ CT = jconj.read_conj_tables("./jconj/data")
 JMDICT_ABBREV_MAP = {v: k for k, vs in CT["kwpos"].items() for v in vs}
 JMDICT_ABBREV_MAP["expressions (phrases, clauses, etc.)"] = "exp"
 
-tokenizer_obj = dictionary.Dictionary().create()
-tagger = Tagger("-Owakati")
-jmd = Jamdict()
-google_translate = googletrans.Translator()
+# Jamdict's SQLite connection, the Sudachi tokenizer and the MeCab tagger
+# are not safe to share between threads, so each thread checks out its own
+# bundle from a bounded pool. Bundles move between threads, so all of a
+# bundle's SQLite access goes through one connection that is not pinned to
+# the thread that opened it.
+RESOURCE_POOL_SIZE = 4
+RESOURCE_POOL_TIMEOUT = 5.0
+
+# Which SudachiDict package to tokenize with: "small", "core" or "full".
+# None uses whichever dictionary sudachipy is linked to.
+SUDACHI_DICTS = ("small", "core", "full")
+SUDACHI_DICT = os.environ.get("JA_HELPER_SUDACHI_DICT") or None
+
+# SQLite limits a statement to 999 bound parameters, and the bulk lookup
+# binds every key once per table.
+BULK_LOOKUP_CHUNK = 300
+
+# Degradations applied under a latency budget, keyed by the fraction of the
+# budget that must have elapsed before each one kicks in.
+DEGRADATION_THRESHOLDS = {
+    "skip_google": 0.25,
+    "cap_span": 0.5,
+    "skip_reading_fallback": 0.75,
+    "single_morpheme": 0.9,
+}
+DEGRADED_MAX_SPAN = 3
+
+# Seconds to wait on Google Translate, further limited by any latency budget
+GOOGLE_TIMEOUT = 5.0
 
 SUDACHI_POS_MAP = {
     "感動詞": "interjection",
@@ -80,20 +132,307 @@ kata_re = "[\u30A0-\u30FF]"
 alphanum_re = "[\uFF01-\uFF5E]"
 
 
-def google(text: str):
+class ResourcePoolExhausted(RuntimeError):
+    pass
+
+
+@dataclass
+class Resources(object):
+    tokenizer: tokenizer.Tokenizer
+    tagger: Tagger
+    jmd: Jamdict
+    translator: googletrans.Translator
+    db: Optional[sqlite3.Connection] = None
+    jmdict_ctx: Optional[object] = None
+
+
+# SudachiPy keeps its settings in a module-level global while a dictionary
+# is being loaded.
+sudachi_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def sudachi_settings(name: str) -> Dict[str, object]:
+    if name not in SUDACHI_DICTS:
+        raise ValueError(
+            f"Unknown Sudachi dictionary {name!r}, expected one of {SUDACHI_DICTS}"
+        )
+
+    try:
+        package = importlib.import_module(f"sudachidict_{name}")
+    except ImportError:
+        raise ValueError(
+            f"Sudachi dictionary {name!r} is not installed "
+            f"(pip install SudachiDict-{name})"
+        ) from None
+
+    resources = Path(sudachipy.__file__).parent / "resources"
+    settings = json.loads((resources / "sudachi.json").read_text(encoding="utf-8"))
+    system_dict = Path(package.__file__).parent / "resources" / "system.dic"
+    settings["systemDict"] = str(system_dict)
+    return settings
+
+
+def sudachi_dictionary(name: Optional[str] = None) -> dictionary.Dictionary:
+    with sudachi_lock:
+        if name is None:
+            return dictionary.Dictionary()
+
+        # SudachiPy only reads the settings file while loading, so it need not
+        # outlive this call
+        resources = Path(sudachipy.__file__).parent / "resources"
+        with tempfile.TemporaryDirectory(prefix="sudachi_") as tmp:
+            config_path = Path(tmp) / f"sudachi_{name}.json"
+            config_path.write_text(json.dumps(sudachi_settings(name)), encoding="utf-8")
+            return dictionary.Dictionary(
+                config_path=str(config_path), resource_dir=str(resources)
+            )
+
+
+def create_resources(
+    sudachi_dict: Optional[str] = None,
+    sudachi_tokenizer: Optional[tokenizer.Tokenizer] = None,
+) -> Resources:
+    if sudachi_tokenizer is None:
+        sudachi_tokenizer = sudachi_dictionary(sudachi_dict).create()
+
+    return Resources(
+        tokenizer=sudachi_tokenizer,
+        tagger=Tagger("-Owakati"),
+        jmd=Jamdict(reuse_ctx=False),
+        translator=googletrans.Translator(timeout=httpx.Timeout(GOOGLE_TIMEOUT)),
+    )
+
+
+class ResourcePool(object):
+    def __init__(
+        self, size: int, timeout: float, sudachi_dict: Optional[str] = None
+    ):
+        if size < 1:
+            raise ValueError(f"Resource pool size must be positive, got {size}")
+        self.size = size
+        self.timeout = timeout
+        self.sudachi_dict = sudachi_dict
+        self.created = 0
+        self.idle: "queue.LifoQueue[Resources]" = queue.LifoQueue()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> Resources:
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            create = self.created < self.size
+            if create:
+                self.created += 1
+
+        if create:
+            try:
+                return create_resources(self.sudachi_dict)
+            except BaseException:
+                with self.lock:
+                    self.created -= 1
+                raise
+
+        try:
+            return self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise ResourcePoolExhausted(
+                f"All {self.size} dictionary resource bundles are in use "
+                f"(waited {self.timeout}s); raise RESOURCE_POOL_SIZE or "
+                "reduce the number of concurrent callers"
+            ) from None
+
+    def add(self, resources: Resources):
+        # Take over a bundle that was built outside the pool
+        with self.lock:
+            if self.created >= self.size:
+                raise ValueError(f"Resource pool already holds {self.size} bundles")
+            self.created += 1
+        self.idle.put(resources)
+
+    def release(self, resources: Resources):
+        self.idle.put(resources)
+
+
+resource_pool = ResourcePool(RESOURCE_POOL_SIZE, RESOURCE_POOL_TIMEOUT, SUDACHI_DICT)
+_thread_state = threading.local()
+KEEP_SUDACHI_DICT = object()
+
+
+def configure_resource_pool(
+    size: int = RESOURCE_POOL_SIZE,
+    timeout: float = RESOURCE_POOL_TIMEOUT,
+    sudachi_dict: Optional[str] = KEEP_SUDACHI_DICT,  # type: ignore
+):
+    # Bundles checked out of the old pool are dropped when released
+    global resource_pool
+    if sudachi_dict is KEEP_SUDACHI_DICT:
+        sudachi_dict = resource_pool.sudachi_dict
+    elif sudachi_dict is not None:
+        sudachi_settings(sudachi_dict)
+
+    if sudachi_dict != resource_pool.sudachi_dict:
+        # Readings and parts of speech depend on the Sudachi dictionary
+        resolve_reading.cache_clear()
+        cached_all_conjugations.cache_clear()
+
+    resource_pool = ResourcePool(size, timeout, sudachi_dict)
+
+
+@contextlib.contextmanager
+def held_resources():
+    # Nested uses on the same thread reuse the bundle that is already held
+    held = getattr(_thread_state, "resources", None)
+    if held is not None:
+        yield held
+        return
+
+    pool = resource_pool
+    resources = pool.acquire()
+    _thread_state.resources = resources
     try:
-        return google_translate.translate(text, src="ja", dest="en").text
+        yield resources
+    finally:
+        _thread_state.resources = None
+        pool.release(resources)
+
+
+def with_resources(f):
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        with held_resources():
+            return f(*args, **kwargs)
+
+    return wrapper
+
+
+class LatencyBudget(object):
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.start = time.monotonic()
+        self.degradations: List[str] = []
+
+    def elapsed_fraction(self) -> float:
+        if self.seconds <= 0:
+            return 1.0
+        return (time.monotonic() - self.start) / self.seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.seconds - (time.monotonic() - self.start))
+
+    def degrade(self, stage: str) -> bool:
+        if stage in self.degradations:
+            return True
+
+        if self.elapsed_fraction() < DEGRADATION_THRESHOLDS[stage]:
+            return False
+
+        self.degradations.append(stage)
+        return True
+
 
-    except Exception as e:
-        import traceback
+def degraded(budget: Optional[LatencyBudget], stage: str) -> bool:
+    return budget is not None and budget.degrade(stage)
 
+
+def google(text: str, budget: Optional[LatencyBudget] = None):
+    if degraded(budget, "skip_google"):
+        return "<Google Translate skipped>"
+
+    timeout = GOOGLE_TIMEOUT
+    if budget is not None:
+        timeout = min(timeout, budget.remaining())
+
+    try:
+        with held_resources() as res:
+            res.translator.client.timeout = httpx.Timeout(timeout)
+            return res.translator.translate(text, src="ja", dest="en").text
+
+    except Exception:
         traceback.print_exc()
         return "<Google Translate failed!!!>"
 
 
 @functools.lru_cache(maxsize=None)
 def jmdict_lookup(s: str):
-    return jmd.lookup(s, lookup_chars=False)
+    with held_resources() as res:
+        return res.jmd.lookup(s, lookup_chars=False, ctx=jmdict_context(res))
+
+
+JmdictIds = Dict[str, Tuple[int, ...]]
+
+# JMdict entry ids per lookup key, filled by jmdict_exists and
+# jmdict_bulk_lookup. An empty tuple records a known miss.
+jmdict_id_cache: JmdictIds = {}
+
+BULK_LOOKUP_QUERY = """
+SELECT text, idseq FROM Kanji WHERE text IN ({0})
+UNION SELECT text, idseq FROM Kana WHERE text IN ({0})
+UNION SELECT SenseGloss.text, Sense.idseq FROM Sense
+    JOIN SenseGloss ON Sense.ID == SenseGloss.sid WHERE SenseGloss.text IN ({0})
+"""
+
+
+def jmdict_exists(s: str) -> bool:
+    ids = jmdict_id_cache.get(s)
+    if ids is None:
+        ids = tuple(e.idseq for e in jmdict_lookup(s).entries)
+        jmdict_id_cache[s] = ids
+    return bool(ids)
+
+
+def jmdict_connection(res: Resources) -> sqlite3.Connection:
+    if res.db is None:
+        uri = Path(res.jmd.db_file).resolve().as_uri() + "?mode=ro"
+        # The pool hands a bundle to one thread at a time, but not always the
+        # same thread
+        res.db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    return res.db
+
+
+def jmdict_context(res: Resources):
+    # Jamdict's own contexts open a connection pinned to the current thread,
+    # so run its lookups over the bundle's connection instead
+    if res.jmdict_ctx is None:
+        ctx = res.jmd.jmdict.ctx()
+        ctx.conn.close()
+        ctx.conn = jmdict_connection(res)
+        res.jmdict_ctx = ctx
+    return res.jmdict_ctx
+
+
+def jmdict_bulk_lookup(keys: Iterable[str]) -> JmdictIds:
+    # Jamdict matches with LIKE, which ignores ASCII case, so keys with ASCII
+    # letters or LIKE wildcards are left to jmdict_lookup
+    keys = set(keys)
+    missing = [
+        k
+        for k in keys
+        if k not in jmdict_id_cache
+        and not re.search("[%_@A-Za-z]", k)
+        and k[:3] != "id#"
+    ]
+
+    try:
+        with held_resources() as res:
+            db = jmdict_connection(res)
+            for c in range(0, len(missing), BULK_LOOKUP_CHUNK):
+                chunk = missing[c : c + BULK_LOOKUP_CHUNK]
+                query = BULK_LOOKUP_QUERY.format(", ".join("?" * len(chunk)))
+                found: Dict[str, set] = {k: set() for k in chunk}
+                for text, idseq in db.execute(query, chunk * 3):
+                    found.setdefault(text, set()).add(idseq)
+                for k, ids in found.items():
+                    jmdict_id_cache[k] = tuple(sorted(ids))
+
+    except sqlite3.Error:
+        traceback.print_exc()
+
+    # Anything the bulk query could not handle falls back to one lookup each
+    return {k: jmdict_id_cache[k] if jmdict_exists(k) else () for k in keys}
 
 
 def guess_verb_class(pos: SudachiPos) -> Optional[VerbClass]:
@@ -132,6 +471,28 @@ morpheme.Morpheme.__str__ = morpheme_to_str
 morpheme.Morpheme.__repr__ = morpheme_to_str
 
 
+@functools.lru_cache(maxsize=None)
+def resolve_reading(surface: str, sudachi_reading: str, dform: str) -> str:
+    sudachi_dict_reading = "".join(m.reading_form() for m in parse(dform))
+    surface_lForms = [m.feature.lForm for m in fugashi_parse(surface)]
+    dict_lForms = [m.feature.lForm for m in fugashi_parse(dform)]
+    fugashi_reading = "".join(surface_lForms) if all(surface_lForms) else ""
+    fugashi_dict_reading = "".join(dict_lForms) if all(dict_lForms) else ""
+    sudachi_lookup = jmdict_exists(jaconv.kata2hira(sudachi_reading))
+    sudachi_dict_lookup = jmdict_exists(jaconv.kata2hira(sudachi_dict_reading))
+    fugashi_dict_lookup = fugashi_dict_reading and jmdict_exists(
+        jaconv.kata2hira(fugashi_dict_reading)
+    )
+
+    if not (sudachi_lookup or sudachi_dict_lookup) and fugashi_dict_lookup:
+        return fugashi_reading
+
+    return sudachi_reading
+
+
+NOT_COMPUTED = object()
+
+
 @dataclass
 class MultiMorpheme(object):
     morphemes: List[morpheme.Morpheme]
@@ -142,6 +503,9 @@ class MultiMorpheme(object):
         else:
             self.morphemes = ms
 
+        # Memoized since dictionary_form and part_of_speech both need it
+        self.potential_form: Optional[str] = NOT_COMPUTED  # type: ignore
+
     def __str__(self) -> str:
         return "|".join(m.surface() for m in self.morphemes)
 
@@ -161,26 +525,7 @@ class MultiMorpheme(object):
         if re.match(rf"{kata_re}+", surface) and not sudachi_reading:
             return surface
 
-        sudachi_dict_reading = "".join(
-            m.reading_form() for m in parse(self.dictionary_form())
-        )
-        surface_lForms = [m.feature.lForm for m in fugashi_parse(self.surface())]
-        dict_lForms = [m.feature.lForm for m in fugashi_parse(self.dictionary_form())]
-        fugashi_reading = "".join(surface_lForms) if all(surface_lForms) else ""
-        fugashi_dict_reading = "".join(dict_lForms) if all(dict_lForms) else ""
-        sudachi_lookup = jmdict_lookup(jaconv.kata2hira(sudachi_reading)).entries
-        sudachi_dict_lookup = jmdict_lookup(
-            jaconv.kata2hira(sudachi_dict_reading)
-        ).entries
-        fugashi_dict_lookup = (
-            fugashi_dict_reading
-            and jmdict_lookup(jaconv.kata2hira(fugashi_dict_reading)).entries
-        )
-
-        if not (sudachi_lookup or sudachi_dict_lookup) and fugashi_dict_lookup:
-            return fugashi_reading
-
-        return sudachi_reading
+        return resolve_reading(surface, sudachi_reading, self.dictionary_form())
 
     def parts_of_speech(self) -> List[SudachiPos]:
         return [m.part_of_speech() for m in self.morphemes]
@@ -210,6 +555,11 @@ class MultiMorpheme(object):
         return False
 
     def maybe_potential_form(self) -> Optional[str]:
+        if self.potential_form is NOT_COMPUTED:
+            self.potential_form = self.find_potential_form()
+        return self.potential_form
+
+    def find_potential_form(self) -> Optional[str]:
         pos = self.pos_str()
         surface = self.surface()
 
@@ -220,7 +570,7 @@ class MultiMorpheme(object):
             and len(self.morphemes) == 1
             and self.morphemes[0].dictionary_form() == surface
             and romkan.to_roma(surface).endswith("eru")
-            and not jmdict_lookup(surface).entries
+            and not jmdict_exists(surface)
         ):
             suf = romkan.to_hiragana(romkan.to_roma(surface[-2:])[:-3] + "u")
             maybe_dform = surface[:-2] + suf
@@ -228,7 +578,7 @@ class MultiMorpheme(object):
         elif (
             pos[0] == "v"
             and romkan.to_roma(self.morphemes[0].surface()).endswith("e")
-            and not jmdict_lookup(surface).entries
+            and not jmdict_exists(surface)
         ):
             suf = romkan.to_hiragana(
                 romkan.to_roma(self.morphemes[0].surface()[-1])[:-1] + "u"
@@ -251,7 +601,7 @@ class MultiMorpheme(object):
         ):
             return
 
-        if not jmdict_lookup(maybe_dform).entries:
+        if not jmdict_exists(maybe_dform):
             return
 
         return maybe_dform
@@ -322,20 +672,32 @@ class MultiMorpheme(object):
             return all_conj  # type: ignore
         return merge_multi_dicts([flip_multi_dict(m) for m in all_conj.values()])
 
-    def lookup(self):
+    def lookup_key(self) -> Optional[str]:
         dform = self.dictionary_form()
 
         if dform == self.surface():
-            return jmdict_lookup(self.surface()).entries
+            return self.surface()
 
         if self.surface() in self.all_conjugations():
-            return jmdict_lookup(dform).entries
+            return dform
+
+        return None
+
+    def lookup(self):
+        key = self.lookup_key()
+        if key is not None:
+            return jmdict_lookup(key).entries
 
     def detect_conjugation(self) -> List[str]:
         return self.all_conjugations().get(self.surface(), [])
 
-    def score(self) -> float:
-        return bool(self.lookup()) * len(self.morphemes) ** 2
+    def score(self, table: Optional[JmdictIds] = None) -> float:
+        if table is None:
+            return bool(self.lookup()) * len(self.morphemes) ** 2
+
+        key = self.lookup_key()
+        found = key is not None and bool(table.get(key) or jmdict_exists(key))
+        return found * len(self.morphemes) ** 2
 
 
 MM = MultiMorpheme
@@ -404,6 +766,7 @@ def sudachi_jmdict_abbrev_match(s_pos: SudachiPos, j_pos: str) -> bool:
     return False
 
 
+@with_resources
 def search_morpheme(
     m: MultiMorpheme, match_reading=True
 ) -> List[Tuple[jmdict.JMDEntry, List[int]]]:
@@ -461,7 +824,7 @@ def guess_exact_pos(dict_form: str, pos: SudachiPos) -> Tuple[str, List[str]]:
     if dict_form in ("だ", "です") and pos[4] in ("助動詞-タ", "助動詞-ダ", "助動詞-デス"):
         return "だ", ["cop-da"]
 
-    entries = jmdict_lookup(dict_form).entries
+    entries = jmdict_lookup(dict_form).entries if jmdict_exists(dict_form) else []
     pos_strs = {p for e in entries for s in e.senses for p in s.pos}
     pos_abbrevs = [a for p in pos_strs if (a := JMDICT_ABBREV_MAP.get(p))]
     pos_matches = [
@@ -476,6 +839,19 @@ def guess_exact_pos(dict_form: str, pos: SudachiPos) -> Tuple[str, List[str]]:
 
 def all_conjugations(
     dict_form: str, pos: Union[str, SudachiPos], refs=False
+) -> Dict[str, Dict[str, List[str]]]:
+    """Conjugation tables for dict_form, keyed by JMdict part of speech.
+
+    Results are cached and shared between callers, so they must not be
+    mutated."""
+    if not isinstance(pos, str):
+        pos = tuple(pos)  # type: ignore
+    return cached_all_conjugations(dict_form, pos, refs)
+
+
+@functools.lru_cache(maxsize=None)
+def cached_all_conjugations(
+    dict_form: str, pos: Union[str, SudachiPos], refs: bool
 ) -> Dict[str, Dict[str, List[str]]]:
     if isinstance(pos, str):
         pos_matches = [pos]
@@ -611,19 +987,72 @@ def merge_multi_dicts(ds: List[Dict[K, List[V]]]) -> Dict[K, List[V]]:
     return result
 
 
-def post_parse(morphemes: List[morpheme.Morpheme]) -> List[MultiMorpheme]:
+def candidate_units(morphemes: List[morpheme.Morpheme]) -> List[List[MultiMorpheme]]:
+    # Shortest first, which post_parse relies on
+    n = len(morphemes)
+    units: List[List[MultiMorpheme]] = [[] for _ in range(n)]
+
+    for i in range(n - 1, -1, -1):
+        for j in range(i + 1, n + 1):
+            unit = MultiMorpheme(morphemes[i:j])
+            if unit.composition_check():
+                units[i].append(unit)
+
+    return units
+
+
+def span_allowed(unit: MultiMorpheme, budget: Optional[LatencyBudget]) -> bool:
+    size = len(unit.morphemes)
+    if size > DEGRADED_MAX_SPAN and degraded(budget, "cap_span"):
+        return False
+    if size > 1 and degraded(budget, "single_morpheme"):
+        return False
+    return True
+
+
+def prefetch_lookups(
+    units: List[List[MultiMorpheme]], budget: Optional[LatencyBudget] = None
+) -> JmdictIds:
+    table = jmdict_bulk_lookup(
+        u.surface() for us in units for u in us if span_allowed(u, budget)
+    )
+
+    dforms = set()
+    for us in reversed(units):
+        for u in us:
+            # Single-morpheme units are not scored once that stage kicks in
+            if degraded(budget, "single_morpheme"):
+                break
+            if span_allowed(u, budget):
+                dforms.add(u.dictionary_form())
+
+    table.update(jmdict_bulk_lookup(dforms))
+    return table
+
+
+@with_resources
+def post_parse(
+    morphemes: List[morpheme.Morpheme], budget: Optional[LatencyBudget] = None
+) -> List[MultiMorpheme]:
     n = len(morphemes)
+    if n == 0:
+        return []
+
     dp: List[Tuple[float, List[MultiMorpheme]]] = [
         (float("-inf"), []) for _ in range(n)
     ]
+    units = candidate_units(morphemes)
+    table = prefetch_lookups(units, budget)
 
     for i in range(n - 1, -1, -1):
-        for j in range(i + 1, n + 1):
-            unit = MultiMorpheme(morphemes[i:j])
-            if not unit.composition_check():
-                continue
+        for unit in units[i]:
+            # Units are shortest first, so no longer span is allowed either
+            if not span_allowed(unit, budget):
+                break
 
-            unit_score = unit.score()
+            j = i + len(unit.morphemes)
+            single = degraded(budget, "single_morpheme")
+            unit_score = 0 if single else unit.score(table)
 
             if j == n:
                 if unit_score >= dp[i][0]:
@@ -640,18 +1069,23 @@ def post_parse(morphemes: List[morpheme.Morpheme]) -> List[MultiMorpheme]:
 
 def parse(text: str) -> List[Morpheme]:
     mode = tokenizer.Tokenizer.SplitMode.A
-    return list(tokenizer_obj.tokenize(text, mode))
+    with held_resources() as res:
+        return list(res.tokenizer.tokenize(text, mode))
 
 
 def fugashi_parse(text: str):
-    p = tagger.parse(text)
-    return tagger(p)
+    with held_resources() as res:
+        p = res.tagger.parse(text)
+        return res.tagger(p)
 
 
-def translation_assist(text: str):
-    morphs = post_parse(parse(text))
+@with_resources
+def translation_assist(text: str, budget: Optional[float] = None) -> List[str]:
+    # budget is in seconds; the degradations it forced are returned
+    latency_budget = None if budget is None else LatencyBudget(budget)
+    morphs = post_parse(parse(text), latency_budget)
     print(" ".join(m.surface() for m in morphs))
-    print(google(text))
+    print(google(text, latency_budget))
 
     morphemes_seen = set()
 
@@ -708,8 +1142,9 @@ def translation_assist(text: str):
         show_entry_readings = False
         if not entries and match_reading and has_kanji:
             print("    No reading matches")
-            entries = search_morpheme(m, match_reading=False)
-            show_entry_readings = True
+            if not degraded(latency_budget, "skip_reading_fallback"):
+                entries = search_morpheme(m, match_reading=False)
+                show_entry_readings = True
 
         if not entries:
             if sudachi_pos not in ("numeral", "proper noun"):
@@ -718,7 +1153,7 @@ def translation_assist(text: str):
                     ", ".join(pos),
                 )
 
-            print(f"    [google] {google(dform)}")
+            print(f"    [google] {google(dform, latency_budget)}")
             print()
 
         for entry, senses in entries:
@@ -740,7 +1175,282 @@ def translation_assist(text: str):
                 print(f"    {gloss}{pos_str}")
             print()
 
+    degradations = latency_budget.degradations if latency_budget else []
+    if degradations:
+        print(f"[degraded: {', '.join(degradations)}]")
+
+    return degradations
+
+
+# Units that are never worth counting or warming
+SKIPPED_POS = ("blank space", "symbol", "supplementary symbol")
+
+
+@dataclass
+class WarmupReport(object):
+    words: int
+    failures: int
+    seconds: float
+    rss_delta_kb: Optional[int]
+    cache_sizes: Dict[str, int]
+
+    def __str__(self) -> str:
+        caches = ", ".join(f"{k}={v}" for k, v in self.cache_sizes.items())
+        rss = "n/a"
+        if self.rss_delta_kb is not None:
+            rss = f"{self.rss_delta_kb / 1024:+.1f} MiB"
+        return (
+            f"Warmed {self.words} words ({self.failures} failed) "
+            f"in {self.seconds:.2f}s, {rss} RSS [{caches}]"
+        )
+
+
+def peak_rss_kb() -> int:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def current_rss_kb() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def cache_sizes() -> Dict[str, int]:
+    sizes = {
+        f.__name__: f.cache_info().currsize
+        for f in (jmdict_lookup, resolve_reading, cached_all_conjugations)
+    }
+    sizes["jmdict_id_cache"] = len(jmdict_id_cache)
+    return sizes
+
+
+def read_frequency_list(path: str) -> List[str]:
+    # Anything after the first whitespace (e.g. a count column) is ignored
+    words = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if fields and not fields[0].startswith("#"):
+                words.append(fields[0])
+    return words
+
+
+@with_resources
+def frequency_list_from_corpus(lines: Iterable[str]) -> List[str]:
+    counts: collections.Counter = collections.Counter()
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        for m in post_parse(parse(line)):
+            if m.display_part_of_speech() not in SKIPPED_POS:
+                counts[m.surface()] += 1
+    return [word for word, _ in counts.most_common()]
+
+
+@with_resources
+def warm_caches(
+    words: Iterable[str] = (),
+    top_n: Optional[int] = None,
+    corpus: Optional[Iterable[str]] = None,
+) -> WarmupReport:
+    # words should be ordered most frequent first
+    start = time.monotonic()
+    rss_before = current_rss_kb()
+    count = failures = 0
+
+    # Deriving the list from a corpus already fills most caches, so it is
+    # part of the warm-up being measured
+    if corpus is not None:
+        words = frequency_list_from_corpus(corpus)
+
+    for word in words:
+        if top_n is not None and count >= top_n:
+            break
+        count += 1
+
+        try:
+            for m in post_parse(parse(word)):
+                m.dictionary_form()
+                m.all_conjugations()
+                m.reading_form()
+                search_morpheme(m)
+                search_morpheme(m, match_reading=False)
+        except Exception:
+            print(f"Failed to warm {word!r}", file=sys.stderr)
+            traceback.print_exc()
+            failures += 1
+
+    rss_after = current_rss_kb()
+    rss_delta_kb = None
+    if rss_before is not None and rss_after is not None:
+        rss_delta_kb = rss_after - rss_before
+
+    return WarmupReport(
+        words=count,
+        failures=failures,
+        seconds=time.monotonic() - start,
+        rss_delta_kb=rss_delta_kb,
+        cache_sizes=cache_sizes(),
+    )
+
+
+@dataclass
+class ReadingUnit(object):
+    surface: str
+    reading: str
+    dictionary_form: str
+    part_of_speech: str
+    conjugations: List[str]
+
+
+@with_resources
+def annotate_readings(text: str) -> List[ReadingUnit]:
+    units = []
+    for m in post_parse(parse(text)):
+        units.append(
+            ReadingUnit(
+                surface=m.surface(),
+                reading=jaconv.kata2hira(m.reading_form()),
+                dictionary_form=m.dictionary_form(),
+                part_of_speech=m.display_part_of_speech(),
+                conjugations=m.detect_conjugation(),
+            )
+        )
+    return units
+
+
+def ruby(surface: str, reading: str) -> str:
+    # Okurigana are left outside the ruby
+    if not reading or not re.search(kanji_re, surface):
+        return html.escape(surface)
+
+    kana = jaconv.kata2hira(surface)
+    start = 0
+    while (
+        start < min(len(kana), len(reading))
+        and not re.match(kanji_re, kana[start])
+        and kana[start] == reading[start]
+    ):
+        start += 1
+
+    end = 0
+    while (
+        end < min(len(kana), len(reading)) - start
+        and not re.match(kanji_re, kana[-end - 1])
+        and kana[-end - 1] == reading[-end - 1]
+    ):
+        end += 1
+
+    base = surface[start : len(surface) - end]
+    rt = reading[start : len(reading) - end]
+    if not rt:
+        return html.escape(surface)
+
+    return "{}<ruby>{}<rt>{}</rt></ruby>{}".format(
+        html.escape(surface[:start]),
+        html.escape(base),
+        html.escape(rt),
+        html.escape(surface[len(surface) - end :]),
+    )
+
+
+def format_readings(text: str, fmt: str = "ruby") -> str:
+    units = annotate_readings(text)
+
+    if fmt == "ruby":
+        return "".join(ruby(u.surface, u.reading) for u in units)
+
+    elif fmt == "tsv":
+        return "".join(
+            "\t".join(
+                (
+                    u.surface,
+                    u.reading,
+                    u.dictionary_form,
+                    u.part_of_speech,
+                    " ".join(u.conjugations),
+                )
+            )
+            + "\n"
+            for u in units
+            if u.part_of_speech != "blank space"
+        )
+
+    raise ValueError(f"Unknown readings format {fmt!r}, expected 'ruby' or 'tsv'")
+
+
+def annotate_corpus(
+    lines: Iterable[str], fmt: str = "ruby", workers: int = 1
+) -> Iterator[str]:
+    # Segmentation is CPU bound, so extra workers are processes, each with
+    # its own dictionaries
+    lines = (line.rstrip("\r\n") for line in lines)
+    format_line = functools.partial(format_readings, fmt=fmt)
+
+    if workers <= 1:
+        yield from map(format_line, lines)
+        return
+
+    with multiprocessing.Pool(
+        workers,
+        initializer=configure_resource_pool,
+        initargs=(1, RESOURCE_POOL_TIMEOUT, resource_pool.sudachi_dict),
+    ) as pool:
+        yield from pool.imap(format_line, lines, chunksize=64)
+
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        translation_assist(" ".join(sys.argv[1:]))
+    parser = argparse.ArgumentParser()
+    parser.add_argument("text", nargs="*")
+    parser.add_argument(
+        "--budget", type=float, help="latency budget per sentence, in seconds"
+    )
+    parser.add_argument(
+        "--warm", metavar="FILE", help="pre-warm caches from a word frequency list"
+    )
+    parser.add_argument(
+        "--warm-corpus",
+        metavar="FILE",
+        help="pre-warm caches from the most frequent words in a sample corpus",
+    )
+    parser.add_argument(
+        "--top", type=int, default=1000, help="number of words to pre-warm"
+    )
+    parser.add_argument(
+        "--sudachi-dict",
+        choices=SUDACHI_DICTS,
+        default=SUDACHI_DICT,
+        help="SudachiDict package to tokenize with",
+    )
+    parser.add_argument(
+        "--readings",
+        action="store_true",
+        help="only print segmentation and readings, one line per input line "
+        "(read from stdin when no text is given)",
+    )
+    parser.add_argument("--format", choices=("ruby", "tsv"), default="ruby")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    configure_resource_pool(sudachi_dict=args.sudachi_dict)
+
+    if args.warm:
+        print(warm_caches(read_frequency_list(args.warm), args.top))
+    elif args.warm_corpus:
+        with open(args.warm_corpus, encoding="utf-8") as f:
+            print(warm_caches(top_n=args.top, corpus=f))
+
+    if args.readings:
+        lines = [" ".join(args.text)] if args.text else sys.stdin
+        for annotated in annotate_corpus(lines, args.format, args.workers):
+            sys.stdout.write(annotated + "\n")
+
+    elif args.text:
+        translation_assist(" ".join(args.text), budget=args.budget)
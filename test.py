@@ -1,4 +1,5 @@
 import unittest
+import importlib.util
 from ja_helper import *
 
 
@@ -36,5 +37,153 @@ class TestConjugationRecognition(unittest.TestCase):
         self.assertEqual(post_parse(morphs), [M])
 
 
+class TestResourcePool(unittest.TestCase):
+    def test_concurrent_parse(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(RESOURCE_POOL_SIZE) as executor:
+            texts = ["思っている"] * 8
+            results = list(executor.map(lambda s: post_parse(parse(s)), texts))
+
+        for morphs in results:
+            self.assertEqual([m.surface() for m in morphs], ["思っている"])
+
+    def test_bundle_changes_thread(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        pool = ResourcePool(1, 1.0)
+
+        def lookup(key):
+            resources = pool.acquire()
+            try:
+                ctx = jmdict_context(resources)
+                return resources.jmd.lookup(key, lookup_chars=False, ctx=ctx).entries
+            finally:
+                pool.release(resources)
+
+        # Separate executors, so each lookup runs on a different thread
+        with ThreadPoolExecutor(1) as executor:
+            self.assertTrue(executor.submit(lookup, "曲がる").result())
+        with ThreadPoolExecutor(1) as executor:
+            self.assertTrue(executor.submit(lookup, "思う").result())
+
+    def test_nested_reuse(self):
+        with held_resources() as outer:
+            with held_resources() as inner:
+                self.assertIs(outer, inner)
+
+    def test_exhausted(self):
+        pool = ResourcePool(1, 0.01)
+        resources = pool.acquire()
+        with self.assertRaises(ResourcePoolExhausted):
+            pool.acquire()
+        pool.release(resources)
+        self.assertIs(pool.acquire(), resources)
+
+
+class TestLatencyBudget(unittest.TestCase):
+    def test_unlimited(self):
+        morphs = parse("思っている")
+        budget = LatencyBudget(float("inf"))
+        self.assertEqual(post_parse(morphs, budget), [MultiMorpheme(morphs)])
+        self.assertEqual(budget.degradations, [])
+
+    def test_exhausted(self):
+        morphs = parse("思っている")
+        budget = LatencyBudget(0)
+        self.assertEqual(
+            post_parse(morphs, budget), [MultiMorpheme([m]) for m in morphs]
+        )
+        self.assertEqual(budget.degradations, ["single_morpheme"])
+        self.assertEqual(google("思っている", budget), "<Google Translate skipped>")
+
+
+class TestGoogle(unittest.TestCase):
+    def test_timeout_applied(self):
+        import httpx
+        from unittest import mock
+
+        sent = []
+
+        def send(client, request, timeout):
+            timeout.as_dict()
+            sent.append(timeout)
+            raise RuntimeError("mocked transport")
+
+        with mock.patch.object(
+            httpx.Client, "_send_single_request", autospec=True, side_effect=send
+        ):
+            result = google("思う", LatencyBudget(2.0))
+
+        self.assertEqual(result, "<Google Translate failed!!!>")
+        self.assertTrue(sent)
+        self.assertIsInstance(sent[0], httpx.Timeout)
+        self.assertLessEqual(sent[0].read_timeout, 2.0)
+
+
+class TestBulkLookup(unittest.TestCase):
+    def setUp(self):
+        # Other tests leave these keys cached, which would skip the query
+        jmdict_id_cache.clear()
+
+    def test_matches_single_lookup(self):
+        keys = ["曲がる", "思う", "大学院生", "ずっと", "ずっとずっと", "CD", "cd", "Tシャツ"]
+        table = jmdict_bulk_lookup(keys)
+        for key in keys:
+            ids = sorted(e.idseq for e in jmdict_lookup(key).entries)
+            self.assertEqual(sorted(table[key]), ids)
+
+
+class TestSudachiDict(unittest.TestCase):
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            sudachi_settings("huge")
+
+    def test_core(self):
+        import sudachidict_core
+
+        system_dict = Path(sudachi_settings("core")["systemDict"])
+        package_dir = Path(sudachidict_core.__file__).parent
+        self.assertEqual(system_dict.parent.parent, package_dir)
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("sudachidict_full"), "SudachiDict-full not installed"
+    )
+    def test_full(self):
+        core = sudachi_dictionary("core").lexicon.size()
+        full = sudachi_dictionary("full").lexicon.size()
+        self.assertGreater(full, core)
+
+
+class TestWarmup(unittest.TestCase):
+    def test_warm_caches(self):
+        report = warm_caches(["曲がります", "思っている", "大学院生"], top_n=2)
+        self.assertEqual(report.words, 2)
+        self.assertEqual(report.failures, 0)
+        self.assertGreater(report.cache_sizes["jmdict_lookup"], 0)
+        self.assertGreater(report.cache_sizes["cached_all_conjugations"], 0)
+
+
+class TestReadings(unittest.TestCase):
+    def test_ruby(self):
+        self.assertEqual(ruby("聞いて", "きいて"), "<ruby>聞<rt>き</rt></ruby>いて")
+        self.assertEqual(ruby("お茶", "おちゃ"), "お<ruby>茶<rt>ちゃ</rt></ruby>")
+        self.assertEqual(ruby("この", "この"), "この")
+
+    def test_annotate(self):
+        units = annotate_readings("思っている")
+        self.assertEqual(len(units), 1)
+        self.assertEqual(units[0].reading, "おもっている")
+        self.assertEqual(units[0].dictionary_form, "思う")
+
+    def test_corpus_keeps_blank_lines_and_indents(self):
+        annotated = list(annotate_corpus(["\n", "　この\n"]))
+        self.assertEqual(annotated, ["", "　この"])
+
+    def test_tsv(self):
+        lines = format_readings("大学院生", fmt="tsv").splitlines()
+        self.assertEqual(lines[0].split("\t")[:2], ["大学院生", "だいがくいんせい"])
+
+
 if __name__ == "__main__":
     unittest.main()